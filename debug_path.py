@@ -8,8 +8,9 @@ if os.path.exists(path):
     if os.path.isdir(path):
         print("It is a directory. Contents:")
         try:
-            for f in os.listdir(path):
-                print(f" - {f}")
+            with os.scandir(path) as it:
+                for entry in it:
+                    print(f" - {entry.name}{'/' if entry.is_dir(follow_symlinks=False) else ''}")
         except Exception as e:
             print(f"Error listing dir: {e}")
     else:
@@ -21,8 +22,9 @@ else:
     if os.path.exists(parent):
         print("Parent exists. Contents:")
         try:
-             for f in os.listdir(parent):
-                print(f" - {f}")
+             with os.scandir(parent) as it:
+                for entry in it:
+                    print(f" - {entry.name}{'/' if entry.is_dir(follow_symlinks=False) else ''}")
         except Exception as e:
             print(f"Error listing parent: {e}")
     else:
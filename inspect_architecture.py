@@ -1,48 +1,92 @@
 import sys
 import os
+import json
 import gguf
+from itertools import islice
+
+# MONKEYPATCH: Teach gguf about MXFP4 (quantization type 39) if it predates it
+# IntEnum lookups of unknown values go through _missing_, so we register the
+# member there on first use and the regular GGUFReader can handle the file.
+if not hasattr(gguf.GGMLQuantizationType, 'MXFP4'):
+    _MXFP4 = 39
+    _orig_missing = gguf.GGMLQuantizationType._missing_
+
+    def _patched_missing(cls, value):
+        if value == _MXFP4:
+            member = int.__new__(cls, _MXFP4)
+            member._name_ = 'MXFP4'
+            member._value_ = _MXFP4
+            cls._value2member_map_[_MXFP4] = member
+            cls._member_map_['MXFP4'] = member
+            return member
+        return _orig_missing(value)
+
+    gguf.GGMLQuantizationType._missing_ = classmethod(_patched_missing)
+    # MXFP4 block: 32 weights = 1 shared exponent byte + 16 bytes of packed 4-bit values
+    gguf.GGML_QUANT_SIZES.setdefault(gguf.GGMLQuantizationType(_MXFP4), (32, 17))
+
+def _load_cached_summary(cache_path, key):
+    # Sidecar cache is only valid if the GGUF file's mtime and size are unchanged
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cached, dict) or cached.get("key") != key:
+        return None
+    return cached
+
+def _format_field_value(field):
+    last = field.parts[-1]
+    # Don't let numpy format large parts (e.g. tokenizer data) just for a debug line
+    if hasattr(last, 'nbytes') and last.nbytes > 256:
+        return f"<{last.dtype} x {last.shape}, {last.nbytes} bytes>"
+    return str(last)
+
+def _print_summary(summary):
+    print("\n--- Model Architecture ---")
+    print(f"Architecture: {summary['arch']}")
+    if summary["block_count"] is not None:
+        print(f"Layers (Block Count): {summary['block_count']}")
+    else:
+        print("Could not determine layer count directly from standard keys.")
+
+    print(f"\n--- Metadata (First 20 items) ---")
+    for name, value in summary["fields"]:
+        print(f"{name}: {value}")
+
+    print("\n--- Tensor Info (First 10 Tensors) ---")
+    for name, shape, tensor_type in summary["tensors"]:
+        print(f"Tensor: {name} | Shape: {shape} | Type: {tensor_type}")
 
 def inspect_gguf(model_path):
     print(f"Inspecting GGUF file: {model_path}")
     
-    # MONKEYPATCH: Handle unknown quantization types (like 39 for MXFP4)
-    try:
-        # Attempt to add the unknown type to the Enum if it doesn't exist
-        # This prevents the GGUFReader from crashing when it encounters type 39
-        if not hasattr(gguf.GGMLQuantizationType, 'MXFP4'):
-             # We extend the IntEnum mechanism or simply mock it if possible
-             # Since IntEnum is hard to extend, we might just need to wrap the reader
-             pass
-    except Exception as e:
-        print(f"Patching warning: {e}")
-
+    # Reuse the summary from a previous run if the file hasn't changed
+    key = [int(os.path.getmtime(model_path)), os.path.getsize(model_path)]
+    cache_path = model_path + ".inspect.json"
+    cached = _load_cached_summary(cache_path, key)
+    if cached is not None:
+        print(f"(Using cached summary from {cache_path})")
+        _print_summary(cached)
+        return
+    
     try:
         # We wrap the reader initialization to catch the specific ValueError
-        reader = gguf.GGUFReader(model_path)
+        # Read-only memmap: tensor data stays on disk unless a tensor is actually touched
+        reader = gguf.GGUFReader(model_path, 'r')
     except ValueError as e:
         if "not a valid GGMLQuantizationType" in str(e):
-            print("\nError: The 'gguf' library encountered an unknown quantization type (likely MXFP4, type 39).")
-            print("Attempting to patch the library in memory to bypass this...")
+            print("\nError: The 'gguf' library encountered an unknown quantization type.")
             
             try:
-                # Force add the missing value to the Enum's internal map if possible
-                # Or re-implement a robust reader. 
-                # Simplest hack: The library fails during tensor reading. 
-                # We can try to read just the header/metadata manually if the Reader fails.
-                
-                # Let's try to patch the Enum class directly
-                from enum import IntEnum
-                class PatchedGGMLQuantizationType(IntEnum):
-                    MXFP4 = 39 
-                    # ... copy others if needed, but we can't easily replace the class ref inside the module.
-                
-                # Better approach: Just raw read the file using struct to get metadata
+                # Just raw read the file using struct to get metadata
                 # GGUF format: Magic, Version, TensorCount, KVCount, ...
                 print("Falling back to raw binary inspection for metadata...")
                 inspect_gguf_raw(model_path)
                 return
             except Exception as patch_e:
-                print(f"Could not patch or raw read: {patch_e}")
+                print(f"Could not raw read: {patch_e}")
                 return
         else:
              print(f"Error reading GGUF file: {e}")
@@ -51,44 +95,112 @@ def inspect_gguf(model_path):
         print(f"Error reading GGUF file: {e}")
         return
 
-    print("\n--- Model Architecture ---")
-    print(f"Architecture: {reader.get_field('general.architecture').parts[-1].tobytes().decode('utf-8')}")
+    # Decode once, tolerantly: a stray byte shouldn't abort the rest of the printout
+    arch_field = reader.get_field('general.architecture')
+    arch = bytes(arch_field.parts[-1]).decode('utf-8', errors='replace') if arch_field is not None else "unknown"
     
-    # Try to find layer count
-    try:
-        block_count = reader.get_field(f"{reader.get_field('general.architecture').parts[-1].tobytes().decode('utf-8')}.block_count")
-        if block_count:
-             print(f"Layers (Block Count): {block_count.parts[-1][0]}")
-    except:
-        print("Could not determine layer count directly from standard keys.")
+    # Layer count lives under "<arch>.block_count"; get_field returns None if absent
+    block_count = None
+    bc_field = reader.get_field(f"{arch}.block_count")
+    if bc_field is not None:
+        block_count = int(bc_field.parts[-1][0])
 
-    print(f"\n--- Metadata (First 20 items) ---")
-    for i, field in enumerate(reader.fields.values()):
-        if i >= 20:
-            break
-        print(f"{field.name}: {field.parts[-1]}")
+    summary = {
+        "key": key,
+        "arch": arch,
+        "block_count": block_count,
+        "fields": [[field.name, _format_field_value(field)] for field in islice(reader.fields.values(), 20)],
+        "tensors": [[tensor.name, str(tensor.shape), str(tensor.tensor_type)] for tensor in islice(reader.tensors, 10)],
+    }
+    _print_summary(summary)
 
-    print("\n--- Tensor Info (First 10 Tensors) ---")
-    for i, tensor in enumerate(reader.tensors):
-        if i >= 10:
-            break
-        print(f"Tensor: {tensor.name} | Shape: {tensor.shape} | Type: {tensor.tensor_type}")
+    try:
+        with open(cache_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, separators=(',', ':'))
+    except OSError as e:
+        print(f"\nCould not write summary cache: {e}")
 
+import mmap
 import struct
 
+# Precompiled little-endian decoders for the raw GGUF reader
+_U32 = struct.Struct("<I")
+_U64 = struct.Struct("<Q")
+# Header: magic, version, tensor count, KV count
+_HEADER = struct.Struct("<4sIQQ")
+
+# GGUF scalar value types: type id -> (name, decoder)
+_SCALAR_TYPES = {
+    0: ("uint8", struct.Struct("<B")),
+    1: ("int8", struct.Struct("<b")),
+    2: ("uint16", struct.Struct("<H")),
+    3: ("int16", struct.Struct("<h")),
+    4: ("uint32", _U32),
+    5: ("int32", struct.Struct("<i")),
+    6: ("float32", struct.Struct("<f")),
+    7: ("bool", struct.Struct("?")),
+    10: ("uint64", _U64),
+    11: ("int64", struct.Struct("<q")),
+    12: ("float64", struct.Struct("<d")),
+}
+_SCALAR_SIZE = {t: fmt.size for t, (_, fmt) in _SCALAR_TYPES.items()}
+_TYPE_NAMES = {t: name for t, (name, _) in _SCALAR_TYPES.items()}
+_TYPE_NAMES[8] = "string"
+_TYPE_NAMES[9] = "array"
+
+def _read_string(mm, off):
+    s_len = _U64.unpack_from(mm, off)[0]
+    off += 8
+    return mm[off:off + s_len].decode("utf-8", errors="replace"), off + s_len
+
+def _skip_array(mm, off):
+    # Advance past an array value without materializing its elements
+    arr_type = _U32.unpack_from(mm, off)[0]
+    arr_len = _U64.unpack_from(mm, off + 4)[0]
+    off += 12
+    if arr_type in _SCALAR_SIZE:
+        off += _SCALAR_SIZE[arr_type] * arr_len
+    elif arr_type == 8:
+        # Hot loop on tokenizer vocabularies (100k+ strings): each length
+        # prefix depends on the previous offset, so keep the body to one
+        # pre-bound unpack and an add
+        unpack_len = _U64.unpack_from
+        for _ in range(arr_len):
+            off += 8 + unpack_len(mm, off)[0]
+    elif arr_type == 9:
+        for _ in range(arr_len):
+            _, off = _skip_array(mm, off)
+    else:
+        raise ValueError(f"unknown array element type {arr_type}")
+    if off > len(mm):
+        raise ValueError("array runs past end of file")
+    type_name = _TYPE_NAMES.get(arr_type, arr_type)
+    return f"[Array<{type_name}> x {arr_len}]", off
+
+def _scalar_reader(fmt):
+    def read(mm, off):
+        return fmt.unpack_from(mm, off)[0], off + fmt.size
+    return read
+
+# GGUF value type -> reader(mm, off) returning (value, new_off)
+_VALUE_READERS = {t: _scalar_reader(fmt) for t, (_, fmt) in _SCALAR_TYPES.items()}
+_VALUE_READERS[8] = _read_string
+_VALUE_READERS[9] = _skip_array
+
 def inspect_gguf_raw(path):
     # Minimal GGUF parser to extract KV pairs even if tensors fail
     # Spec: https://github.com/ggerganov/ggml/blob/master/docs/gguf.md
-    with open(path, "rb") as f:
-        # Header
-        magic = f.read(4)
+    # The file is memory-mapped so the KV walk is offset arithmetic, not read() calls
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        # Header, decoded in one unpack
+        if len(mm) < _HEADER.size:
+            print("Not a GGUF file (too short)")
+            return
+        magic, version, tensor_count, kv_count = _HEADER.unpack_from(mm, 0)
         if magic != b"GGUF":
             print("Not a GGUF file (bad magic)")
             return
-        
-        version = struct.unpack("<I", f.read(4))[0]
-        tensor_count = struct.unpack("<Q", f.read(8))[0]
-        kv_count = struct.unpack("<Q", f.read(8))[0]
+        off = _HEADER.size
         
         print(f"\n[RAW READ MODE]")
         print(f"GGUF Version: {version}")
@@ -99,52 +211,18 @@ def inspect_gguf_raw(path):
         for _ in range(kv_count):
             try:
                 # Key
-                key_len = struct.unpack("<Q", f.read(8))[0]
-                key = f.read(key_len).decode("utf-8")
+                key, off = _read_string(mm, off)
                 
                 # Value Type
-                val_type = struct.unpack("<I", f.read(4))[0]
-                
-                # Value (Simplified handling for common types)
-                # GGUF_TYPE_UINT8   = 0
-                # GGUF_TYPE_INT8    = 1
-                # ...
-                # GGUF_TYPE_STRING  = 8
-                # GGUF_TYPE_ARRAY   = 9
-                # ...
-                # GGUF_TYPE_UINT32  = 4
-                # GGUF_TYPE_INT32   = 5
-                # GGUF_TYPE_FLOAT32 = 6
-                # GGUF_TYPE_BOOL    = 7
-                # GGUF_TYPE_UINT64  = 10
-                # GGUF_TYPE_INT64   = 11
-                # GGUF_TYPE_FLOAT64 = 12
+                val_type = _U32.unpack_from(mm, off)[0]
+                off += 4
                 
-                value = "?"
-                if val_type == 8: # String
-                    s_len = struct.unpack("<Q", f.read(8))[0]
-                    value = f.read(s_len).decode("utf-8", errors="replace")
-                elif val_type in [4, 5]: # Int32/Uint32
-                    value = struct.unpack("<I", f.read(4))[0]
-                elif val_type in [10, 11]: # Int64/Uint64
-                    value = struct.unpack("<Q", f.read(8))[0]
-                elif val_type == 6: # Float32
-                    value = struct.unpack("<f", f.read(4))[0]
-                elif val_type == 7: # Bool
-                    value = struct.unpack("?", f.read(1))[0]
-                elif val_type == 9: # Array (Skip content roughly)
-                     arr_type = struct.unpack("<I", f.read(4))[0]
-                     arr_len = struct.unpack("<Q", f.read(8))[0]
-                     value = f"[Array of {arr_len} items, type {arr_type}]"
-                     # We have to actually skip the bytes to get to next key
-                     # This is hard without full implementation, so we might stop here
-                     print(f"{key}: {value} (Stopping raw read due to array complexity)")
-                     break
-                else:
-                    # Generic skip attempt (risky)
-                    # Use predefined sizes if possible, else break
-                     print(f"{key}: [Unknown Type {val_type}] (Stopping raw read)")
-                     break
+                reader = _VALUE_READERS.get(val_type)
+                if reader is None:
+                    # No size is known for this type, so the next key can't be located
+                    print(f"{key}: [Unknown Type {val_type}] (Stopping raw read)")
+                    break
+                value, off = reader(mm, off)
 
                 print(f"{key}: {value}")
                 
@@ -12,7 +12,14 @@ import os
 def visualize_llm_internals(model_name="gpt2-small", prompt="The quick brown fox jumps over the lazy dog"):
     print(f"Loading model: {model_name}...")
     try:
-        model = HookedTransformer.from_pretrained(model_name)
+        # Half precision on accelerators; CPU stays in fp32 since bf16 matmuls are slow there
+        if torch.cuda.is_available():
+            device, dtype = "cuda", torch.bfloat16
+        elif torch.backends.mps.is_available():
+            device, dtype = "mps", torch.float16
+        else:
+            device, dtype = "cpu", torch.float32
+        model = HookedTransformer.from_pretrained(model_name, device=device, dtype=dtype)
     except Exception as e:
         print(f"Error loading model {model_name}: {e}")
         return
@@ -21,7 +28,11 @@ def visualize_llm_internals(model_name="gpt2-small", prompt="The quick brown fox
     print(f"Processing prompt: '{prompt}'")
 
     # 1. Run model and cache activations
-    logits, cache = model.run_with_cache(prompt)
+    # Only cache the hooks used below (embedding, every residual stream, layer 0 attention)
+    needed = {"hook_embed", "blocks.0.attn.hook_pattern"} | {f"blocks.{i}.hook_resid_post" for i in range(model.cfg.n_layers)}
+    # No autograd needed: inference_mode skips building the backward graph
+    with torch.inference_mode():
+        logits, cache = model.run_with_cache(prompt, names_filter=lambda name: name in needed)
     tokens = model.to_str_tokens(prompt)
     
     print("Extracting embeddings and layer activations...")
@@ -33,53 +44,59 @@ def visualize_llm_internals(model_name="gpt2-small", prompt="The quick brown fox
     # 3. Trace a specific token's trajectory through layers
     # let's trace the last token
     token_index = -1 
-    layer_trajectory = []
     
-    # Add input embedding
-    layer_trajectory.append(input_embeddings[0, token_index, :].detach().cpu().numpy())
-    
-    # Add hidden states after each layer
+    # One preallocated [n_layers + 1, d_model] buffer on the model's device:
+    # row 0 is the input embedding, row i+1 the residual stream after layer i
+    # (hook name: blocks.{i}.hook_resid_post). Rows are written in place and
+    # the whole trajectory comes back in a single transfer.
+    trajectory = input_embeddings.new_empty((model.cfg.n_layers + 1, model.cfg.d_model))
+    trajectory[0] = input_embeddings[0, token_index]
     for i in range(model.cfg.n_layers):
-        # Result of the residual stream at layer i
-        # hook name: blocks.{i}.hook_resid_post
-        hidden = cache[f"blocks.{i}.hook_resid_post"][0, token_index, :].detach().cpu().numpy()
-        layer_trajectory.append(hidden)
-        
-    layer_trajectory = np.array(layer_trajectory)
+        trajectory[i + 1] = cache[f"blocks.{i}.hook_resid_post"][0, token_index]
+    
+    # Upcast after the transfer: numpy has no bf16 and PCA wants fp32 anyway
+    layer_trajectory = trajectory.cpu().float().numpy()
     
     # 4. Dimensionality Reduction for Visualization (PCA to 3D)
     print("Computing 3D projection of layer trajectory...")
-    pca = PCA(n_components=3)
+    # Randomized solver only computes the top 3 directions instead of a full SVD
+    pca = PCA(n_components=3, svd_solver='randomized', random_state=0)
     # detailed trajectory
-    traj_3d = pca.fit_transform(layer_trajectory)
+    traj_3d = pca.fit_transform(layer_trajectory.astype(np.float32, copy=False))
     
     # 5. Create 3D Plot of Trajectory
+    # Point labels ("In", L0, L1, ...) and colors as arrays so plotly serializes them in bulk
+    labels = np.empty(len(traj_3d), dtype=object)
+    labels[0] = "In"
+    labels[1:] = [f"L{i}" for i in range(len(traj_3d) - 1)]
+    colors = np.arange(len(traj_3d), dtype=np.int32)
     fig = go.Figure(data=[go.Scatter3d(
         x=traj_3d[:,0], y=traj_3d[:,1], z=traj_3d[:,2],
         mode='lines+markers+text',
-        text=[f"In" if i==0 else f"L{i-1}" for i in range(len(traj_3d))],
-        marker=dict(size=5, color=list(range(len(traj_3d))), colorscale='Viridis'),
+        text=labels,
+        marker=dict(size=5, color=colors, colorscale='Viridis'),
         line=dict(color='darkblue', width=2)
     )])
     fig.update_layout(title=f"Token Trajectory through {model.cfg.n_layers} Layers: '{tokens[token_index]}'",
                       scene=dict(xaxis_title='PCA 1', yaxis_title='PCA 2', zaxis_title='PCA 3'))
     
     output_html_traj = "embedding_trajectory.html"
-    fig.write_html(output_html_traj)
+    # Load plotly.js from the CDN instead of inlining ~3.5 MB of it into the file
+    fig.write_html(output_html_traj, include_plotlyjs='cdn', full_html=True)
     print(f"Saved trajectory visualization to {output_html_traj}")
 
     # 6. Visualize Attention Patterns (Layer 0, all heads)
     print("Generating attention pattern visualization...")
     # Get attention pattern for layer 0: [n_heads, dest_pos, src_pos]
-    attention_pat = cache["blocks.0.attn.hook_pattern"][0] 
+    attention_pat = cache["blocks.0.attn.hook_pattern"][0].float()
     
     # CircuitsVis creates interactive HTML
     attn_viz = cv.attention.attention_patterns(tokens=tokens, attention=attention_pat)
     
     # Save CircuitsVis to HTML file manually since it returns a display object
     output_html_attn = "attention_patterns.html"
-    with open(output_html_attn, "w") as f:
-        f.write(str(attn_viz))
+    with open(output_html_attn, "w", encoding="utf-8") as f:
+        f.write(attn_viz._repr_html_())
     print(f"Saved attention visualization to {output_html_attn}")
     
     print("\nDone! Open the generated HTML files in your browser.")